@@ -1,11 +1,41 @@
+import asyncio
+import io
 import os
-import tempfile
-from typing import Union
+import threading
+import zipfile
+from typing import BinaryIO, Optional, Union
 
+import diskcache
 import docx
-import PyPDF2
+from blake3 import blake3
 from fastapi import UploadFile
 
+# Prefer the PDFium (C++) backend for PDF text extraction; fall back to PyPDF2
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+    import PyPDF2
+
+# PDFium is not thread-safe, so only one thread may use it at a time. DOCX and
+# PyPDF2 parsing have no such restriction and run fully in parallel.
+_pdfium_lock = threading.Lock()
+
+# OCR for scanned PDFs without a text layer is slow, so it is opt-in
+OCR_ENABLED = os.environ.get("OCR_ENABLED", "").lower() in ("1", "true", "yes")
+OCR_MIN_CHARS = int(os.environ.get("OCR_MIN_CHARS", 100))
+try:
+    import pytesseract
+    from pdf2image import convert_from_bytes
+except ImportError:
+    pytesseract = None
+
+# Extracted text keyed by a hash of the file content, shared across workers
+TEXT_CACHE_TTL = 7 * 24 * 60 * 60
+_text_cache = diskcache.Cache(
+    os.environ.get("TEXT_CACHE_DIR", "/tmp/resume_text_cache"), size_limit=2**30
+)
+
 
 async def extract_text_from_file(file: UploadFile) -> str:
     """
@@ -18,73 +48,146 @@ async def extract_text_from_file(file: UploadFile) -> str:
         str: Extracted text from the document
     
     Raises:
-        ValueError: If file format is not supported
+        ValueError: If the file content is not a PDF or DOCX document
     """
     content = await file.read()
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    
-    # Create a temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
-        temp_file.write(content)
-        temp_file_path = temp_file.name
     
     try:
-        # Extract text based on file type
-        if file_ext == ".pdf":
-            text = extract_text_from_pdf(temp_file_path)
-        elif file_ext == ".docx":
-            text = extract_text_from_docx(temp_file_path)
-        else:
-            raise ValueError(f"Unsupported file format: {file_ext}")
-        
-        return text
+        # Cache lookups and parsing are blocking, so run them together in a
+        # worker thread to keep the event loop free
+        return await asyncio.to_thread(_extract_text, content, file.filename)
     finally:
-        # Clean up the temporary file
-        os.unlink(temp_file_path)
         # Reset file pointer for potential reuse
         await file.seek(0)
 
 
-def extract_text_from_pdf(file_path: str) -> str:
+def _extract_text(content: bytes, filename: str) -> str:
+    """
+    Extract text from raw document content, using the text cache when possible.
+    
+    Args:
+        content: Raw file content
+        filename: Name of the uploaded file, used in error messages
+        
+    Returns:
+        str: Extracted text from the document
+    
+    Raises:
+        ValueError: If the file content is not a PDF or DOCX document
+    """
+    # Skip parsing entirely for documents we've already extracted
+    content_hash = blake3(content).hexdigest()
+    cached_text = _text_cache.get(content_hash)
+    if cached_text is not None:
+        return cached_text
+    
+    # Extract text based on the detected file type rather than the extension,
+    # parsing straight from memory
+    file_format = detect_file_format(content)
+    if file_format == ".pdf":
+        text = extract_text_from_pdf(io.BytesIO(content))
+        # Scanned PDFs have little or no text layer; fall back to OCR
+        if len(text.strip()) < OCR_MIN_CHARS and OCR_ENABLED and pytesseract is not None:
+            text = extract_text_from_pdf_ocr(content)
+    elif file_format == ".docx":
+        text = extract_text_from_docx(io.BytesIO(content))
+    else:
+        raise ValueError(f"Unsupported file format: {filename} is not a PDF or DOCX document")
+    
+    # Don't cache near-empty text (e.g. a scanned PDF parsed without OCR), so
+    # enabling OCR later takes effect for documents already seen
+    if len(text.strip()) >= OCR_MIN_CHARS:
+        _text_cache.set(content_hash, text, expire=TEXT_CACHE_TTL)
+    return text
+
+
+def detect_file_format(content: bytes) -> Optional[str]:
+    """
+    Detect a document's format from its leading bytes.
+    
+    Args:
+        content: Raw file content
+        
+    Returns:
+        Optional[str]: ".pdf" or ".docx", or None if the format is not recognized
+    """
+    # PDF readers accept the header anywhere in the first 1024 bytes
+    if b"%PDF-" in content[:1024]:
+        return ".pdf"
+    
+    # DOCX is a ZIP package (PK\x03\x04) with a [Content_Types].xml part and a
+    # word/document.xml main part; other OOXML formats (XLSX, PPTX) lack the latter
+    if content[:4] == b"PK\x03\x04" and zipfile.is_zipfile(io.BytesIO(content)):
+        with zipfile.ZipFile(io.BytesIO(content)) as package:
+            names = set(package.namelist())
+            if "[Content_Types].xml" in names and "word/document.xml" in names:
+                return ".docx"
+    
+    return None
+
+
+def extract_text_from_pdf(source: Union[str, BinaryIO]) -> str:
     """
     Extract text from a PDF file.
     
     Args:
-        file_path: Path to the PDF file
+        source: Path to the PDF file or a binary file-like object
         
     Returns:
         str: Extracted text
     """
-    text = ""
-    with open(file_path, "rb") as f:
-        pdf_reader = PyPDF2.PdfReader(f)
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text() + "\n"
+    if pdfium is not None:
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(source)
+            try:
+                pages = []
+                for page in pdf:
+                    textpage = page.get_textpage()
+                    try:
+                        pages.append(textpage.get_text_bounded())
+                    finally:
+                        # Close children before the document rather than leaving
+                        # them to finalizers
+                        textpage.close()
+                        page.close()
+                return "\n".join(pages)
+            finally:
+                pdf.close()
     
-    return text
+    pdf_reader = PyPDF2.PdfReader(source)
+    return "\n".join(page.extract_text() or "" for page in pdf_reader.pages)
 
 
-def extract_text_from_docx(file_path: str) -> str:
+def extract_text_from_pdf_ocr(content: bytes) -> str:
     """
-    Extract text from a DOCX file.
+    Extract text from a scanned PDF by rendering each page and running OCR.
     
     Args:
-        file_path: Path to the DOCX file
+        content: Raw PDF content
         
     Returns:
         str: Extracted text
     """
-    doc = docx.Document(file_path)
-    text = ""
+    images = convert_from_bytes(content)
+    return "\n".join(pytesseract.image_to_string(image) for image in images)
+
+
+def extract_text_from_docx(source: Union[str, BinaryIO]) -> str:
+    """
+    Extract text from a DOCX file.
     
-    for paragraph in doc.paragraphs:
-        text += paragraph.text + "\n"
+    Args:
+        source: Path to the DOCX file or a binary file-like object
+        
+    Returns:
+        str: Extracted text
+    """
+    doc = docx.Document(source)
+    parts = [paragraph.text for paragraph in doc.paragraphs]
     
     # Also extract text from tables
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                text += cell.text + "\n"
+    parts.extend(
+        cell.text for table in doc.tables for row in table.rows for cell in row.cells
+    )
     
-    return text
+    return "\n".join(parts)
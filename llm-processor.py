@@ -1,27 +1,133 @@
+import asyncio
+import functools
+import hashlib
+import logging
 import os
-from typing import List, Dict, Any
+import re
+import textwrap
+from typing import List, Dict, Any, Optional, Tuple
+
+import httpx
+import numpy as np
+import openai
+import orjson
+from aiolimiter import AsyncLimiter
+from cachetools import TTLCache
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
 # Import OpenAI API
 from openai import AsyncOpenAI
 
+# Redis is only needed for the optional semantic score cache
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+# Shared HTTP/2 connection pool, so concurrent scoring calls reuse a few
+# multiplexed connections instead of paying a TLS handshake each
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(
+        max_keepalive_connections=100, max_connections=200, keepalive_expiry=60.0
+    ),
+    timeout=httpx.Timeout(60.0, connect=10.0),
+)
+
 # Configure OpenAI client
 client = AsyncOpenAI(
-    api_key=os.environ.get("OPENAI_API_KEY", "your-api-key")
+    api_key=os.environ.get("OPENAI_API_KEY", "your-api-key"),
+    http_client=http_client,
 )
 
+logger = logging.getLogger(__name__)
 
-async def extract_criteria_with_llm(job_description: str) -> List[str]:
+# Client-side throttle so bursts of scoring calls stay under the account's
+# request rate limit instead of discovering it through 429 responses
+LLM_REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 500))
+llm_rate_limiter = AsyncLimiter(LLM_REQUESTS_PER_MINUTE, 60)
+
+_backoff = wait_exponential_jitter(initial=1, max=30)
+
+
+def _wait_for_retry(retry_state) -> float:
     """
-    Use an LLM to extract key criteria from a job description.
+    Wait for the server's Retry-After delay when given, else back off exponentially.
     
     Args:
-        job_description: Text of the job description
+        retry_state: Tenacity state for the failed attempt
         
     Returns:
-        List[str]: List of extracted criteria
+        float: Seconds to wait before the next attempt
     """
-    # Prepare the prompt
-    system_prompt = """
+    response = getattr(retry_state.outcome.exception(), "response", None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get("retry-after")), 60.0)
+        except (TypeError, ValueError):
+            pass
+    return _backoff(retry_state)
+
+
+# Retry transient OpenAI failures (rate limits, timeouts, connection and server
+# errors). Chat calls go through a client with the SDK's own retries disabled so
+# the two retry layers don't multiply.
+chat_client = client.with_options(max_retries=0)
+
+_llm_retry = retry(
+    stop=stop_after_attempt(6),
+    wait=_wait_for_retry,
+    retry=retry_if_exception_type(
+        (
+            openai.RateLimitError,
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.InternalServerError,
+        )
+    ),
+    reraise=True,
+)
+
+# Maximum time to wait for an OpenAI Batch API job before cancelling it
+BATCH_POLL_TIMEOUT = float(os.environ.get("BATCH_POLL_TIMEOUT", 15 * 60))
+
+# Number of resumes scored together in a single bulk scoring call
+BULK_SCORING_CHUNK_SIZE = int(os.environ.get("BULK_SCORING_CHUNK_SIZE", 5))
+
+# Score cache: an in-process exact-match LRU (L1) backed by an optional Redis
+# vector index (L2) that matches near-duplicate resumes scored on the same criteria
+SCORE_CACHE_TTL = 24 * 60 * 60
+# The semantic tier must only serve near-identical resumes (e.g. re-exports of
+# the same document), never a different candidate with a similar profile, so
+# it requires a very high similarity over the whole text and a similar length
+SCORE_CACHE_SIMILARITY = float(os.environ.get("SCORE_CACHE_SIMILARITY", 0.98))
+SCORE_CACHE_LENGTH_TOLERANCE = 0.02
+SCORE_CACHE_INDEX = "resume_scores"
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+
+# Embeddings API limits: inputs per request, a character budget per input that
+# keeps resumes safely under the model's token limit, and a character budget
+# per request that keeps the request under its total token limit
+EMBEDDING_BATCH_SIZE = 2048
+EMBEDDING_MAX_CHARS = 8000
+EMBEDDING_MAX_REQUEST_CHARS = 400_000
+
+_score_cache = TTLCache(maxsize=1024, ttl=SCORE_CACHE_TTL)
+
+REDIS_URL = os.environ.get("REDIS_URL")
+redis_client = aioredis.from_url(REDIS_URL) if aioredis and REDIS_URL else None
+_redis_index_ready = False
+
+# Prompts are module-level constants so every call sends a byte-identical
+# prefix, which lets OpenAI's automatic prompt caching reuse it. Anything that
+# varies per call belongs in the user message, after the stable parts.
+SYSTEM_PROMPT_EXTRACT = textwrap.dedent("""
     You are an expert HR system that analyzes job descriptions and extracts key ranking criteria.
     Extract specific criteria related to:
     1. Required skills
@@ -30,48 +136,487 @@ async def extract_criteria_with_llm(job_description: str) -> List[str]:
     4. Certifications
     5. Technical knowledge
     6. Soft skills
-    
+
     Format each criterion as a clear, standalone requirement. Do not include vague statements.
     Return only the list of criteria, with each item being a specific, measurable requirement.
+""").strip()
+
+SYSTEM_PROMPT_SCORE = textwrap.dedent("""
+    You are an expert HR system that evaluates resumes against job criteria.
+    For each criterion, provide a score from 0 to 5, where:
+
+    0: No evidence of meeting the criterion
+    1: Minimal evidence, significantly below expectations
+    2: Some evidence, but below expectations
+    3: Meets expectations
+    4: Exceeds expectations
+    5: Far exceeds expectations
+
+    Be objective and consistent in your scoring. Focus on concrete evidence in the resume.
+""").strip()
+
+SYSTEM_PROMPT_SCORE_BULK = textwrap.dedent("""
+    You are an expert HR system that evaluates resumes against job criteria.
+    For each resume and each criterion, provide a score from 0 to 5, where:
+
+    0: No evidence of meeting the criterion
+    1: Minimal evidence, significantly below expectations
+    2: Some evidence, but below expectations
+    3: Meets expectations
+    4: Exceeds expectations
+    5: Far exceeds expectations
+
+    Be objective and consistent in your scoring. Score each resume independently,
+    focusing on concrete evidence in that resume.
+""").strip()
+
+USER_PROMPT_EXTRACT = textwrap.dedent("""
+    Extract the key ranking criteria from the following job description:
+
+    {job_description}
+
+    Return ONLY a list of specific criteria, with each item as a clear, standalone requirement.
+""").strip()
+
+USER_PROMPT_SCORE = textwrap.dedent("""
+    Score the following resume against each criterion on a scale of 0-5:
+
+    CRITERIA:
+    {criteria}
+
+    RESUME:
+    {resume_text}
+
+    Submit exactly {num_criteria} integer scores (0-5) in the same order as the criteria
+    using the submit_scores function.
+""").strip()
+
+USER_PROMPT_SCORE_BULK = textwrap.dedent("""
+    Score each of the following resumes against each criterion on a scale of 0-5:
+
+    CRITERIA:
+    {criteria}
+
+    RESUMES:
+    {resumes}
+
+    Return a JSON object of the form {{"scores": {{{keys}}}}}, where each list
+    contains exactly {num_criteria} integer scores (0-5) in the same order as the criteria.
+""").strip()
+
+SCORE_TOOL_NAME = "submit_scores"
+
+# Leading bullet ("-", "•", "*", "·") or numbering ("1.", "12)") on a criterion line
+_BULLET_RE = re.compile(r'^\s*(?:[-•*·]|\d{1,3}[.)])\s+')
+# Markdown heading lines, which are not criteria
+_HEADING_RE = re.compile(r'^#{1,6}\s')
+
+
+def _format_criteria(criteria: List[str]) -> str:
     """
+    Format criteria as a numbered list for inclusion in a prompt.
     
-    user_prompt = f"""
-    Extract the key ranking criteria from the following job description:
+    Args:
+        criteria: List of criteria
+        
+    Returns:
+        str: Numbered criteria, one per line
+    """
+    return "\n".join([f"{i+1}. {criterion}" for i, criterion in enumerate(criteria)])
+
+
+def _log_cache_usage(response: Any) -> None:
+    """
+    Log how many prompt tokens were served from OpenAI's prompt cache.
     
-    {job_description}
+    Args:
+        response: Chat completion response
+    """
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    if usage is None or details is None:
+        return
+    # Older SDKs don't model this field, so it arrives as a plain dict
+    if isinstance(details, dict):
+        cached_tokens = details.get("cached_tokens", 0)
+    else:
+        cached_tokens = getattr(details, "cached_tokens", 0)
+    logger.debug(
+        "Prompt tokens: %s (cached: %s)", usage.prompt_tokens, cached_tokens
+    )
+
+
+def _score_cache_key(resume_text: str, criteria: List[str]) -> str:
+    """
+    Build the exact-match cache key for a resume scored against criteria.
     
-    Return ONLY a list of specific criteria, with each item as a clear, standalone requirement.
+    Args:
+        resume_text: Text extracted from the resume
+        criteria: List of criteria to score against
+        
+    Returns:
+        str: Hex digest identifying the (resume, criteria) pair
     """
+    # Criteria order matters (scores are positional), so they are not sorted
+    material = resume_text.encode("utf-8") + b"\x00" + orjson.dumps(criteria)
+    return hashlib.sha256(material).hexdigest()
+
+
+def _criteria_hash(criteria: List[str]) -> str:
+    """
+    Hash a list of criteria so semantic cache hits are limited to identical criteria.
     
-    # Call the LLM
-    response = await client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.1,  # Low temperature for consistent, focused output
+    Args:
+        criteria: List of criteria
+        
+    Returns:
+        str: Hex digest of the criteria
+    """
+    return hashlib.sha256(orjson.dumps(criteria)).hexdigest()
+
+
+async def _ensure_redis_index() -> None:
+    """
+    Create the Redis vector index used by the semantic score cache, if missing.
+    """
+    global _redis_index_ready
+    if _redis_index_ready:
+        return
+    try:
+        await redis_client.execute_command(
+            "FT.CREATE", SCORE_CACHE_INDEX,
+            "ON", "HASH", "PREFIX", "1", f"{SCORE_CACHE_INDEX}:",
+            "SCHEMA",
+            "criteria_hash", "TAG",
+            "embedding", "VECTOR", "HNSW", "6",
+            "TYPE", "FLOAT32", "DIM", str(EMBEDDING_DIMENSIONS), "DISTANCE_METRIC", "COSINE",
+        )
+    except Exception as e:
+        if "already exists" not in str(e).lower():
+            raise
+    _redis_index_ready = True
+
+
+async def _lookup_cached_scores(
+    resume_text: str, criteria: List[str]
+) -> Tuple[Optional[List[int]], Optional[bytes]]:
+    """
+    Look up previously computed scores for a resume.
+    
+    Args:
+        resume_text: Text extracted from the resume
+        criteria: List of criteria to score against
+        
+    Returns:
+        Tuple[Optional[List[int]], Optional[bytes]]: Cached scores (or None on a
+        miss) and the resume embedding computed for the semantic lookup, so it
+        can be reused when storing fresh scores
+    """
+    return (await _lookup_cached_scores_many([resume_text], criteria))[0]
+
+
+async def _lookup_cached_scores_many(
+    resume_texts: List[str], criteria: List[str]
+) -> List[Tuple[Optional[List[int]], Optional[bytes]]]:
+    """
+    Look up previously computed scores for several resumes at once.
+    
+    Resumes that miss the exact tier are embedded together, so a group of
+    resumes costs one embeddings request rather than one per resume.
+    
+    Args:
+        resume_texts: Texts extracted from each resume
+        criteria: List of criteria to score against
+        
+    Returns:
+        List[Tuple[Optional[List[int]], Optional[bytes]]]: For each resume, the
+        cached scores (or None on a miss) and the embedding computed for the
+        semantic lookup, in the same order as resume_texts
+    """
+    results = [(None, None)] * len(resume_texts)
+    semantic = []
+    for i, resume_text in enumerate(resume_texts):
+        key = _score_cache_key(resume_text, criteria)
+        if key in _score_cache:
+            results[i] = (_score_cache[key], None)
+        # The embedding must cover the whole resume, so longer texts only use the exact tier
+        elif redis_client is not None and len(resume_text) <= EMBEDDING_MAX_CHARS:
+            semantic.append(i)
+    
+    if not semantic:
+        return results
+    
+    try:
+        await _ensure_redis_index()
+        embeddings = await _embed_many([resume_texts[i] for i in semantic])
+    except Exception as e:
+        logger.warning("Semantic score cache lookup failed: %s", e)
+        return results
+    
+    matches = await asyncio.gather(
+        *[
+            _semantic_lookup(resume_texts[i], criteria, embedding.astype("<f4").tobytes())
+            for i, embedding in zip(semantic, embeddings)
+        ]
     )
+    for i, match in zip(semantic, matches):
+        results[i] = match
+    return results
+
+
+async def _semantic_lookup(
+    resume_text: str, criteria: List[str], vector: bytes
+) -> Tuple[Optional[List[int]], bytes]:
+    """
+    Find scores for a near-identical resume in the Redis vector index.
+    
+    Args:
+        resume_text: Text extracted from the resume
+        criteria: List of criteria to score against
+        vector: Embedding of the resume as little-endian float32 bytes
+        
+    Returns:
+        Tuple[Optional[List[int]], bytes]: Cached scores (or None on a miss) and
+        the embedding, so it can be reused when storing fresh scores
+    """
+    try:
+        result = await redis_client.execute_command(
+            "FT.SEARCH", SCORE_CACHE_INDEX,
+            f"(@criteria_hash:{{{_criteria_hash(criteria)}}})=>[KNN 1 @embedding $vec AS distance]",
+            "PARAMS", "2", "vec", vector,
+            "RETURN", "3", "scores", "text_length", "distance",
+            "DIALECT", "2",
+        )
+    except Exception as e:
+        logger.warning("Semantic score cache lookup failed: %s", e)
+        return None, vector
+    
+    # Result layout: [total, key, [field, value, ...], ...]
+    if result and result[0] > 0:
+        fields = dict(zip(result[2][::2], result[2][1::2]))
+        cached_length = int(fields.get(b"text_length", -1))
+        similar_length = (
+            abs(cached_length - len(resume_text))
+            <= SCORE_CACHE_LENGTH_TOLERANCE * max(len(resume_text), 1)
+        )
+        # Cosine distance is 1 - cosine similarity
+        if similar_length and 1 - float(fields[b"distance"]) >= SCORE_CACHE_SIMILARITY:
+            scores = orjson.loads(fields[b"scores"])
+            if len(scores) == len(criteria):
+                _score_cache[_score_cache_key(resume_text, criteria)] = scores
+                return scores, vector
+    
+    return None, vector
+
+
+async def _store_cached_scores(
+    resume_text: str,
+    criteria: List[str],
+    scores: Optional[List[int]],
+    vector: Optional[bytes],
+) -> None:
+    """
+    Store freshly computed scores in both cache tiers.
+    
+    Only scores parsed from a well-formed LLM reply are cached; a failed parse
+    (None) is never stored, so it can't be served again on later requests.
+    
+    Args:
+        resume_text: Text extracted from the resume
+        criteria: List of criteria scored against
+        scores: Scores returned by the LLM, or None if the reply was unusable
+        vector: Resume embedding from the preceding lookup, if one was computed
+    """
+    if scores is None or len(scores) != len(criteria):
+        return
+    
+    key = _score_cache_key(resume_text, criteria)
+    _score_cache[key] = scores
+    
+    if redis_client is None or vector is None:
+        return
+    
+    try:
+        redis_key = f"{SCORE_CACHE_INDEX}:{key}"
+        await redis_client.hset(
+            redis_key,
+            mapping={
+                "criteria_hash": _criteria_hash(criteria),
+                "embedding": vector,
+                "scores": orjson.dumps(scores),
+                "text_length": len(resume_text),
+            },
+        )
+        await redis_client.expire(redis_key, SCORE_CACHE_TTL)
+    except Exception as e:
+        logger.warning("Semantic score cache store failed: %s", e)
+
+
+def _with_score_cache(func):
+    """
+    Serve scores from the score cache before falling back to the wrapped scorer.
+    """
+    @functools.wraps(func)
+    async def wrapper(resume_text: str, criteria: List[str]) -> List[int]:
+        scores, vector = await _lookup_cached_scores(resume_text, criteria)
+        if scores is not None:
+            return scores
+        
+        scores = await func(resume_text, criteria)
+        await _store_cached_scores(resume_text, criteria, scores, vector)
+        return scores
+    
+    return wrapper
+
+
+@_llm_retry
+async def extract_criteria_with_llm(job_description: str) -> List[str]:
+    """
+    Use an LLM to extract key criteria from a job description.
+    
+    Args:
+        job_description: Text of the job description
+        
+    Returns:
+        List[str]: List of extracted criteria
+    """
+    user_prompt = USER_PROMPT_EXTRACT.format(job_description=job_description)
+    
+    # Call the LLM
+    async with llm_rate_limiter:
+        response = await chat_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT_EXTRACT},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0.1,  # Low temperature for consistent, focused output
+        )
+    _log_cache_usage(response)
     
     # Process the response
     criteria_text = response.choices[0].message.content.strip()
     
-    # Convert to list (handling different possible formats)
-    criteria_list = []
-    for line in criteria_text.split('\n'):
-        # Remove bullet points and numbering
-        cleaned_line = line.strip()
-        if cleaned_line.startswith(('- ', '• ', '* ', '· ')):
-            cleaned_line = cleaned_line[2:].strip()
-        elif cleaned_line.startswith(('1. ', '2. ', '3. ', '4. ', '5. ', '6. ', '7. ', '8. ', '9. ', '10. ')):
-            cleaned_line = cleaned_line[3:].strip()
-            
-        if cleaned_line and not cleaned_line.startswith(('#', '##', '###')):
-            criteria_list.append(cleaned_line)
+    # Convert to list, stripping bullet points and numbering and skipping headings
+    criteria_list = [
+        cleaned_line
+        for cleaned_line in (_BULLET_RE.sub('', line.strip()) for line in criteria_text.split('\n'))
+        if cleaned_line and not _HEADING_RE.match(cleaned_line)
+    ]
     
     return criteria_list
 
 
+def _build_score_messages(resume_text: str, criteria: List[str]) -> List[Dict[str, str]]:
+    """
+    Build the chat messages used to score a resume against criteria.
+    
+    Args:
+        resume_text: Text extracted from the resume
+        criteria: List of criteria to score against
+        
+    Returns:
+        List[Dict[str, str]]: System and user messages for the chat completion
+    """
+    user_prompt = USER_PROMPT_SCORE.format(
+        criteria=_format_criteria(criteria),
+        resume_text=resume_text,
+        num_criteria=len(criteria),
+    )
+    
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT_SCORE},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def _validate_scores(values: Any, num_criteria: int) -> Optional[List[int]]:
+    """
+    Check that raw score values hold exactly one integer (0-5) per criterion.
+    
+    Args:
+        values: Score values returned by the LLM
+        num_criteria: Number of criteria that were scored
+        
+    Returns:
+        Optional[List[int]]: The scores, or None if they are missing or malformed
+    """
+    if not isinstance(values, list) or len(values) != num_criteria:
+        return None
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= 5:
+            return None
+    return values
+
+
+def _build_score_tools(num_criteria: int) -> List[Dict[str, Any]]:
+    """
+    Build the function tool the LLM calls to submit resume scores.
+    
+    The schema constrains the reply to exactly one integer (0-5) per criterion.
+    
+    Args:
+        num_criteria: Number of criteria being scored
+        
+    Returns:
+        List[Dict[str, Any]]: Tool definitions for the chat completion
+    """
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": SCORE_TOOL_NAME,
+                "description": "Submit the score for each criterion, in criteria order",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "scores": {
+                            "type": "array",
+                            "items": {"type": "integer", "minimum": 0, "maximum": 5},
+                            "minItems": num_criteria,
+                            "maxItems": num_criteria,
+                        }
+                    },
+                    "required": ["scores"],
+                },
+            },
+        }
+    ]
+
+
+def _parse_scores(arguments: str, criteria: List[str]) -> List[int]:
+    """
+    Parse the arguments of a submit_scores tool call into one score per criterion.
+    
+    The tool schema is not enforced strictly by the API, so the arguments are
+    validated here rather than trusted.
+    
+    Args:
+        arguments: JSON arguments of the tool call
+        criteria: List of criteria that were scored
+        
+    Returns:
+        List[int]: List of scores (0-5) for each criterion
+        
+    Raises:
+        ValueError: If the arguments are not valid JSON or don't contain exactly
+            one integer score (0-5) per criterion
+    """
+    try:
+        values = orjson.loads(arguments)["scores"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("LLM returned unparseable score arguments")
+    
+    scores = _validate_scores(values, len(criteria))
+    if scores is None:
+        raise ValueError(
+            f"LLM returned invalid scores: expected {len(criteria)} integers from 0 to 5"
+        )
+    return scores
+
+
+@_with_score_cache
+@_llm_retry
 async def score_resume_with_llm(resume_text: str, criteria: List[str]) -> List[int]:
     """
     Use an LLM to score a resume against provided criteria.
@@ -83,85 +628,295 @@ async def score_resume_with_llm(resume_text: str, criteria: List[str]) -> List[i
     Returns:
         List[int]: List of scores (0-5) for each criterion
     """
-    # Prepare the prompt
-    system_prompt = """
-    You are an expert HR system that evaluates resumes against job criteria.
-    For each criterion, provide a score from 0 to 5, where:
+    # Call the LLM
+    async with llm_rate_limiter:
+        response = await chat_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=_build_score_messages(resume_text, criteria),
+            temperature=0.1,  # Low temperature for consistent scoring
+            tools=_build_score_tools(len(criteria)),
+            tool_choice={"type": "function", "function": {"name": SCORE_TOOL_NAME}},
+        )
+    _log_cache_usage(response)
     
-    0: No evidence of meeting the criterion
-    1: Minimal evidence, significantly below expectations
-    2: Some evidence, but below expectations
-    3: Meets expectations
-    4: Exceeds expectations
-    5: Far exceeds expectations
+    # Process the response
+    arguments = response.choices[0].message.tool_calls[0].function.arguments
     
-    Be objective and consistent in your scoring. Focus on concrete evidence in the resume.
+    return _parse_scores(arguments, criteria)
+
+
+async def score_resumes_bulk(
+    resumes: List[Tuple[str, str]], criteria: List[str]
+) -> List[Optional[List[int]]]:
     """
+    Use a single LLM call to score several resumes against provided criteria.
     
-    criteria_str = "\n".join([f"{i+1}. {criterion}" for i, criterion in enumerate(criteria)])
+    The model is asked for a JSON object, so no free-text score parsing is
+    needed. Callers should keep each group to BULK_SCORING_CHUNK_SIZE resumes
+    so the prompt fits comfortably in the model's context. Resumes found in
+    the score cache are not sent to the LLM.
     
-    user_prompt = f"""
-    Score the following resume against each criterion on a scale of 0-5:
+    Args:
+        resumes: List of (candidate name, resume text) pairs
+        criteria: List of criteria to score against
+        
+    Returns:
+        List[Optional[List[int]]]: Scores (0-5) for each resume, in the same order
+        as resumes, or None for resumes the model returned no usable scores for
+    """
+    cached = await _lookup_cached_scores_many([text for _, text in resumes], criteria)
+    results = [scores for scores, _ in cached]
+    misses = [i for i, scores in enumerate(results) if scores is None]
+    if not misses:
+        return results
     
-    CRITERIA:
-    {criteria_str}
+    fresh = await _score_resumes_bulk_with_llm([resumes[i] for i in misses], criteria)
+    for i, scores in zip(misses, fresh):
+        results[i] = scores
+        if scores is not None:
+            await _store_cached_scores(resumes[i][1], criteria, scores, cached[i][1])
     
-    RESUME:
-    {resume_text}
+    return results
+
+
+@_llm_retry
+async def _score_resumes_bulk_with_llm(
+    resumes: List[Tuple[str, str]], criteria: List[str]
+) -> List[Optional[List[int]]]:
+    """
+    Score a group of resumes with a single JSON-mode LLM call, bypassing the cache.
     
-    For each criterion, provide ONLY a numeric score (0-5). Return your answers as a list of numbers in the same order as the criteria, with nothing else.
+    Args:
+        resumes: List of (candidate name, resume text) pairs
+        criteria: List of criteria to score against
+        
+    Returns:
+        List[Optional[List[int]]]: Scores (0-5) for each resume, in the same order
+        as resumes, or None for resumes the model returned no usable scores for
     """
+    resumes_str = "\n\n".join(
+        f"===== RESUME_{i+1} ({name}) =====\n{text}"
+        for i, (name, text) in enumerate(resumes)
+    )
+    keys_str = ", ".join(f'"resume_{i+1}": [...]' for i in range(len(resumes)))
+    
+    user_prompt = USER_PROMPT_SCORE_BULK.format(
+        criteria=_format_criteria(criteria),
+        resumes=resumes_str,
+        keys=keys_str,
+        num_criteria=len(criteria),
+    )
     
     # Call the LLM
-    response = await client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.1,  # Low temperature for consistent scoring
+    async with llm_rate_limiter:
+        response = await chat_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT_SCORE_BULK},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0.1,  # Low temperature for consistent scoring
+            response_format={"type": "json_object"},
+        )
+    _log_cache_usage(response)
+    
+    # Process the response, treating malformed or truncated JSON like a reply
+    # with missing scores so only the affected resumes fail
+    try:
+        reply = orjson.loads(response.choices[0].message.content or "")
+    except ValueError:
+        reply = None
+    scores_by_resume = reply.get("scores") if isinstance(reply, dict) else None
+    if not isinstance(scores_by_resume, dict):
+        scores_by_resume = {}
+    
+    # Resumes without a usable score list are reported as None, not padded with
+    # zeros, so callers can surface them as failures
+    results = [
+        _validate_scores(scores_by_resume.get(f"resume_{i+1}"), len(criteria))
+        for i in range(len(resumes))
+    ]
+    
+    return results
+
+
+@_llm_retry
+async def _embed_texts(texts: List[str]) -> np.ndarray:
+    """
+    Embed texts with a single embeddings API call.
+    
+    Args:
+        texts: Texts to embed (at most EMBEDDING_BATCH_SIZE, already truncated
+            to EMBEDDING_MAX_CHARS and EMBEDDING_MAX_REQUEST_CHARS in total)
+        
+    Returns:
+        np.ndarray: One embedding row per text
+    """
+    async with llm_rate_limiter:
+        response = await chat_client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=texts,
+        )
+    return np.array([item.embedding for item in response.data], dtype=np.float32)
+
+
+async def _embed_many(texts: List[str]) -> np.ndarray:
+    """
+    Embed any number of texts, splitting them into as few API requests as the
+    embeddings endpoint's limits allow.
+    
+    Args:
+        texts: Texts to embed; each is truncated to EMBEDDING_MAX_CHARS
+        
+    Returns:
+        np.ndarray: One embedding row per text, in the same order as texts
+    """
+    texts = [text[:EMBEDDING_MAX_CHARS] for text in texts]
+    
+    # Split into requests bounded by both input count and total size
+    chunks = []
+    chunk = []
+    chunk_chars = 0
+    for text in texts:
+        if chunk and (
+            len(chunk) >= EMBEDDING_BATCH_SIZE
+            or chunk_chars + len(text) > EMBEDDING_MAX_REQUEST_CHARS
+        ):
+            chunks.append(chunk)
+            chunk = []
+            chunk_chars = 0
+        chunk.append(text)
+        chunk_chars += len(text)
+    chunks.append(chunk)
+    
+    return np.concatenate(
+        await asyncio.gather(*[_embed_texts(chunk) for chunk in chunks])
     )
+
+
+async def rank_resumes_by_relevance(
+    resume_texts: List[str], criteria: List[str]
+) -> List[float]:
+    """
+    Measure how relevant each resume is to the criteria using embeddings.
     
-    # Process the response
-    score_text = response.choices[0].message.content.strip()
+    This is a cheap pre-filter: embeddings cost a small fraction of a scoring
+    call, so clearly off-topic resumes can be skipped before LLM scoring.
+    
+    Args:
+        resume_texts: Texts extracted from each resume
+        criteria: List of criteria to compare against
+        
+    Returns:
+        List[float]: Cosine similarity between each resume and the criteria,
+        in the same order as resume_texts
+    """
+    embeddings = await _embed_many(["\n".join(criteria)] + resume_texts)
+    
+    criteria_embedding, resume_embeddings = embeddings[0], embeddings[1:]
+    norms = np.linalg.norm(resume_embeddings, axis=1) * np.linalg.norm(criteria_embedding)
+    similarities = resume_embeddings @ criteria_embedding / np.maximum(norms, 1e-12)
+    return similarities.tolist()
+
+
+async def score_resumes_batch(
+    resume_texts: List[str],
+    criteria: List[str],
+    poll_interval: float = 30.0,
+    timeout: float = BATCH_POLL_TIMEOUT,
+) -> List[Optional[List[int]]]:
+    """
+    Score many resumes through the OpenAI Batch API.
+    
+    Batch jobs are billed at a discount but complete asynchronously (within a
+    24h window), so this is intended for large, non-interactive runs. If the
+    job has not finished within the timeout, or the caller is cancelled, the
+    batch is cancelled rather than left running.
+    
+    Args:
+        resume_texts: Texts extracted from each resume
+        criteria: List of criteria to score against
+        poll_interval: Seconds to wait between batch status checks
+        timeout: Seconds to wait for the batch to finish before cancelling it
+        
+    Returns:
+        List[Optional[List[int]]]: Scores for each resume, in the same order as
+        resume_texts, or None for resumes whose request failed in the batch
+        
+    Raises:
+        TimeoutError: If the batch does not finish within the timeout
+        RuntimeError: If the batch job does not complete successfully
+    """
+    # Build one JSONL request line per resume
+    lines = []
+    for i, resume_text in enumerate(resume_texts):
+        request = {
+            "custom_id": f"resume_{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": "gpt-4o-mini",
+                "messages": _build_score_messages(resume_text, criteria),
+                "temperature": 0.1,
+                "tools": _build_score_tools(len(criteria)),
+                "tool_choice": {"type": "function", "function": {"name": SCORE_TOOL_NAME}},
+            },
+        }
+        lines.append(orjson.dumps(request))
+    
+    # Upload the input file and create the batch job
+    batch_file = await client.files.create(
+        file=("resume_scoring.jsonl", b"\n".join(lines)),
+        purpose="batch",
+    )
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
     
-    # Extract scores
-    scores = []
-    for line in score_text.split('\n'):
-        # Try to extract just the numeric score
-        line = line.strip()
+    # Poll until the batch reaches a terminal state or the deadline passes
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            if loop.time() >= deadline:
+                raise TimeoutError(f"Batch {batch.id} did not finish within {timeout:.0f}s")
+            await asyncio.sleep(min(poll_interval, max(deadline - loop.time(), 0)))
+            batch = await client.batches.retrieve(batch.id)
+    except (TimeoutError, asyncio.CancelledError):
+        # Don't leave an abandoned batch running (and billing) in the background
         try:
-            # First, try to extract just the number
-            if line.isdigit() and 0 <= int(line) <= 5:
-                scores.append(int(line))
-            # If that fails, look for patterns like "1. 4" or "Criterion 1: 4"
-            elif ': ' in line and line.split(': ')[1].strip().isdigit():
-                score = int(line.split(': ')[1].strip())
-                if 0 <= score <= 5:
-                    scores.append(score)
-            # Look for patterns like "1. 4" or "1) 4"
-            elif ('. ' in line or ') ' in line) and line.split('. ' if '. ' in line else ') ')[1].strip().isdigit():
-                score = int(line.split('. ' if '. ' in line else ') ')[1].strip())
-                if 0 <= score <= 5:
-                    scores.append(score)
-        except (ValueError, IndexError):
-            continue
-    
-    # If parsing failed, try a more flexible approach
-    if not scores or len(scores) != len(criteria):
-        scores = []
-        # Just extract any digit between 0-5
-        import re
-        digits = re.findall(r'\b[0-5]\b', score_text)
-        for digit in digits:
-            if len(scores) < len(criteria):
-                scores.append(int(digit))
-    
-    # If we still don't have enough scores, fill with zeros
-    while len(scores) < len(criteria):
-        scores.append(0)
-    
-    # If we have too many scores, truncate
-    scores = scores[:len(criteria)]
+            await asyncio.shield(client.batches.cancel(batch.id))
+        except Exception as e:
+            logger.warning("Failed to cancel batch %s: %s", batch.id, e)
+        raise
     
-    return scores
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} finished with status: {batch.status}")
+    
+    # Download the results and demultiplex them by custom_id
+    score_arguments = {}
+    if batch.output_file_id:
+        output = await client.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            result = orjson.loads(line)
+            response = result.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+            tool_calls = response["body"]["choices"][0]["message"].get("tool_calls")
+            if tool_calls:
+                score_arguments[result["custom_id"]] = tool_calls[0]["function"]["arguments"]
+    
+    # Requests that errored, are missing from the output or returned invalid
+    # scores are reported as None so callers can surface them as failures
+    # rather than all-zero scores
+    results = []
+    for i in range(len(resume_texts)):
+        try:
+            results.append(_parse_scores(score_arguments[f"resume_{i}"], criteria))
+        except (KeyError, ValueError):
+            results.append(None)
+    return results
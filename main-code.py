@@ -1,23 +1,173 @@
+import asyncio
+import csv
 import io
+import logging
 import os
 import tempfile
-from typing import List
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional, Tuple
+from urllib.parse import quote
 
-import pandas as pd
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
-from fastapi.responses import StreamingResponse
+import orjson
+import xlsxwriter
+from fastapi import FastAPI, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 from utils.document_processor import extract_text_from_file
-from utils.llm_processor import extract_criteria_with_llm, score_resume_with_llm
+from utils.llm_processor import (
+    BULK_SCORING_CHUNK_SIZE,
+    extract_criteria_with_llm,
+    http_client,
+    rank_resumes_by_relevance,
+    score_resume_with_llm,
+    score_resumes_batch,
+    score_resumes_bulk,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Size the default thread pool used for document parsing via asyncio.to_thread.
+    # PDFium extraction is serialized by a lock in the document processor, so
+    # only DOCX and PyPDF2 parsing actually run in parallel.
+    executor = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4))
+    asyncio.get_running_loop().set_default_executor(executor)
+    try:
+        yield
+    finally:
+        # Close pooled connections used for OpenAI calls
+        await http_client.aclose()
+        executor.shutdown()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Resume Ranking API",
     description="API for extracting job criteria and ranking resumes based on job descriptions",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
+logger = logging.getLogger(__name__)
+
+# Cap the number of in-flight LLM calls to stay under OpenAI rate limits
+MAX_CONCURRENT_SCORING = int(os.environ.get("MAX_CONCURRENT_SCORING", 10))
+scoring_semaphore = asyncio.Semaphore(MAX_CONCURRENT_SCORING)
+
+# In "auto" mode, batches larger than this go through the OpenAI Batch API
+BATCH_SCORING_THRESHOLD = int(os.environ.get("BATCH_SCORING_THRESHOLD", 50))
+
+# For batches of at least PREFILTER_MIN_FILES resumes, resumes whose embedding
+# similarity to the criteria is below PREFILTER_THRESHOLD are given all-zero
+# scores without an LLM scoring call, and marked in a "Pre-filtered" column
+PREFILTER_MIN_FILES = int(os.environ.get("PREFILTER_MIN_FILES", 20))
+PREFILTER_THRESHOLD = float(os.environ.get("PREFILTER_THRESHOLD", 0.25))
+
+
+def write_scores_xlsx(results: List[dict]) -> io.BytesIO:
+    """
+    Write scoring results to an in-memory Excel workbook.
+
+    Parameters:
+    - results: One dict per candidate, all sharing the same keys
+
+    Returns:
+    - Buffer containing the XLSX file, positioned at the start
+    """
+    output = io.BytesIO()
+    # constant_memory spills worksheet rows to a temp file instead of keeping
+    # them as cell objects; the results and the finished workbook still live in memory
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    worksheet = workbook.add_worksheet("Resume Scores")
+
+    headers = list(results[0].keys())
+    worksheet.write_row(0, 0, headers)
+    for row_num, row in enumerate(results, 1):
+        worksheet.write_row(row_num, 0, [row[header] for header in headers])
+
+    workbook.close()
+    output.seek(0)
+    return output
+
+
+def write_scores_csv(results: List[dict]) -> io.BytesIO:
+    """
+    Write scoring results to an in-memory CSV file.
+
+    Parameters:
+    - results: One dict per candidate, all sharing the same keys
+
+    Returns:
+    - Buffer containing the UTF-8 encoded CSV file, positioned at the start
+    """
+    text = io.StringIO()
+    writer = csv.writer(text)
+
+    headers = list(results[0].keys())
+    writer.writerow(headers)
+    for row in results:
+        writer.writerow([row[header] for header in headers])
+
+    return io.BytesIO(text.getvalue().encode("utf-8"))
+
+
+def validate_score_request(criteria: List[str], files: List[UploadFile]) -> None:
+    """
+    Validate the criteria and resume files of a scoring request.
+
+    Parameters:
+    - criteria: List of criteria to score resumes against
+    - files: List of resume files
+
+    Raises:
+    - HTTPException: If criteria or files are missing, or a file type is not supported
+    """
+    if not criteria:
+        raise HTTPException(status_code=400, detail="No criteria provided")
+    
+    if not files:
+        raise HTTPException(status_code=400, detail="No resume files provided")
+
+    # Validate file types
+    allowed_extensions = [".pdf", ".docx"]
+    for file in files:
+        file_ext = os.path.splitext(file.filename)[1].lower()
+        if file_ext not in allowed_extensions:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file type for {file.filename}. Allowed types: {', '.join(allowed_extensions)}",
+            )
+
+
+async def extract_texts(
+    files: List[UploadFile],
+) -> Tuple[List[Tuple[UploadFile, str]], List[Tuple[str, Exception]]]:
+    """
+    Extract text from all resume files concurrently.
+
+    Parameters:
+    - files: List of resume files
+
+    Returns:
+    - (file, text) pairs for files that were extracted, and (filename, error)
+      pairs for files that failed, so one bad file doesn't sink the batch
+    """
+    texts = await asyncio.gather(
+        *[extract_text_from_file(file) for file in files], return_exceptions=True
+    )
+    extracted = []
+    failed_files = []
+    for file, text in zip(files, texts):
+        if isinstance(text, Exception):
+            failed_files.append((file.filename, text))
+        else:
+            extracted.append((file, text))
+    return extracted, failed_files
+
 
 class CriteriaResponse(BaseModel):
     criteria: List[str]
@@ -52,7 +202,13 @@ async def extract_criteria(file: UploadFile = File(...)):
     try:
         # Extract text from the uploaded file
         text = await extract_text_from_file(file)
-        
+    except ValueError as e:
+        # Content is not actually a PDF or DOCX, whatever the extension says
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+
+    try:
         # Process the text with an LLM to extract criteria
         criteria = await extract_criteria_with_llm(text)
         
@@ -70,6 +226,13 @@ async def extract_criteria(file: UploadFile = File(...)):
 async def score_resumes(
     criteria: List[str] = Form(...),
     files: List[UploadFile] = File(...),
+    mode: Literal["realtime", "batch", "auto"] = Query(
+        "realtime",
+        description="Scoring mode: realtime chat completions, the OpenAI Batch API "
+        "(waits up to BATCH_POLL_TIMEOUT seconds), or auto (batch only when the number "
+        "of files exceeds the configured threshold)",
+    ),
+    format: Literal["xlsx", "csv"] = Query("xlsx", description="Output file format"),
 ):
     """
     Score multiple resumes against provided criteria.
@@ -77,74 +240,205 @@ async def score_resumes(
     Parameters:
     - criteria: List of criteria to score resumes against
     - files: List of resume files (PDF or DOCX)
+    - mode: Scoring mode (realtime, batch or auto)
+    - format: Output file format (xlsx or csv)
 
     Returns:
     - Excel/CSV file with scores for each candidate and criterion
     """
-    if not criteria:
-        raise HTTPException(status_code=400, detail="No criteria provided")
-    
-    if not files:
-        raise HTTPException(status_code=400, detail="No resume files provided")
+    validate_score_request(criteria, files)
 
-    # Validate file types
-    allowed_extensions = [".pdf", ".docx"]
-    for file in files:
-        file_ext = os.path.splitext(file.filename)[1].lower()
-        if file_ext not in allowed_extensions:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid file type for {file.filename}. Allowed types: {', '.join(allowed_extensions)}",
+    # Create shorter criterion keys for the Excel/CSV columns once, numbering
+    # any that collide so no criterion's column overwrites another's
+    short_keys = [' '.join(criterion.split()[:3]) + "..." for criterion in criteria]
+    key_counts = Counter(short_keys)
+    short_keys = [
+        f"{key} [{i+1}]" if key_counts[key] > 1 else key for i, key in enumerate(short_keys)
+    ]
+
+    # Set when the relevance pre-filter runs, so every row gets a column saying
+    # whether its zeros come from the pre-filter rather than from LLM scoring
+    prefilter_applied = False
+
+    def _build_result(file: UploadFile, scores: List[int], prefiltered: bool = False) -> dict:
+        # Extract candidate name from filename
+        candidate_name = os.path.splitext(file.filename)[0]
+
+        # Calculate total score
+        total_score = sum(scores)
+
+        candidate_result = {"Candidate Name": candidate_name}
+        for i, key in enumerate(short_keys):
+            candidate_result[key] = scores[i]
+        candidate_result["Total Score"] = total_score
+        if prefilter_applied:
+            candidate_result["Pre-filtered"] = "Yes" if prefiltered else "No"
+        return candidate_result
+
+    async def _score_chunk(chunk: List[tuple]) -> List[Optional[List[int]]]:
+        # Score a group of resumes in a single LLM call
+        async with scoring_semaphore:
+            return await score_resumes_bulk(
+                [(os.path.splitext(file.filename)[0], text) for file, text in chunk],
+                criteria,
             )
 
+    use_batch = mode == "batch" or (mode == "auto" and len(files) > BATCH_SCORING_THRESHOLD)
+
     try:
-        # Process each resume
         results = []
-        for file in files:
-            # Extract candidate name from filename
-            candidate_name = os.path.splitext(file.filename)[0]
-            
-            # Extract text from resume
-            resume_text = await extract_text_from_file(file)
-            
-            # Score resume against criteria
-            scores = await score_resume_with_llm(resume_text, criteria)
-            
-            # Calculate total score
-            total_score = sum(scores)
-            
-            # Add to results
-            candidate_result = {"Candidate Name": candidate_name}
-            for i, criterion in enumerate(criteria):
-                # Create a shorter criterion key for the Excel/CSV
-                short_criterion = ' '.join(criterion.split()[:3]) + "..."
-                candidate_result[short_criterion] = scores[i]
-            candidate_result["Total Score"] = total_score
-            results.append(candidate_result)
-        
+        extracted, failed_files = await extract_texts(files)
+        if not extracted and all(isinstance(error, ValueError) for _, error in failed_files):
+            raise HTTPException(
+                status_code=400,
+                detail="None of the uploaded files are PDF or DOCX documents",
+            )
+
+        if len(extracted) >= PREFILTER_MIN_FILES:
+            # Skip LLM scoring for resumes that are clearly off-topic
+            try:
+                relevance = await rank_resumes_by_relevance(
+                    [text for _, text in extracted], criteria
+                )
+            except Exception as e:
+                logger.warning("Relevance pre-filter failed, scoring all resumes: %s", e)
+            else:
+                prefilter_applied = True
+                relevant = []
+                for (file, text), similarity in zip(extracted, relevance):
+                    if similarity >= PREFILTER_THRESHOLD:
+                        relevant.append((file, text))
+                    else:
+                        results.append(
+                            _build_result(file, [0] * len(criteria), prefiltered=True)
+                        )
+                extracted = relevant
+
+        if extracted and use_batch:
+            # Score all resumes in a single batch job
+            batch_scores = await score_resumes_batch(
+                [text for _, text in extracted], criteria
+            )
+            for (file, _), scores in zip(extracted, batch_scores):
+                if scores is None:
+                    failed_files.append((file.filename, "Batch request failed"))
+                else:
+                    results.append(_build_result(file, scores))
+        elif extracted:
+            # Score resumes in groups, running the groups concurrently
+            chunks = [
+                extracted[i:i + BULK_SCORING_CHUNK_SIZE]
+                for i in range(0, len(extracted), BULK_SCORING_CHUNK_SIZE)
+            ]
+            outcomes = await asyncio.gather(
+                *[_score_chunk(chunk) for chunk in chunks], return_exceptions=True
+            )
+            for chunk, outcome in zip(chunks, outcomes):
+                if isinstance(outcome, Exception):
+                    failed_files.extend((file.filename, outcome) for file, _ in chunk)
+                else:
+                    for (file, _), scores in zip(chunk, outcome):
+                        if scores is None:
+                            failed_files.append((file.filename, "No usable scores returned"))
+                        else:
+                            results.append(_build_result(file, scores))
+
+        if not results:
+            raise HTTPException(
+                status_code=500,
+                detail="Error processing resumes: "
+                + "; ".join(f"{name}: {error}" for name, error in failed_files),
+            )
+
         # Sort results by total score (descending)
         results = sorted(results, key=lambda x: x["Total Score"], reverse=True)
         
-        # Create DataFrame from results
-        df = pd.DataFrame(results)
-        
-        # Create Excel file in memory
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            df.to_excel(writer, sheet_name="Resume Scores", index=False)
-        
-        output.seek(0)
-        
-        # Return Excel file
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=resume_scores.xlsx"}
-        )
+        # Create the report file in memory
+        if format == "csv":
+            output = write_scores_csv(results)
+            media_type = "text/csv"
+        else:
+            output = write_scores_xlsx(results)
+            media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+        headers = {"Content-Disposition": f"attachment; filename=resume_scores.{format}"}
+        if failed_files:
+            # Report files that could not be scored. Names are percent-encoded
+            # since headers must be latin-1, which also escapes any commas
+            headers["X-Failed-Files"] = ",".join(
+                quote(name, safe="") for name, _ in failed_files
+            )
+
+        # Return the report file
+        return StreamingResponse(output, media_type=media_type, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing resumes: {str(e)}")
 
 
+@app.post(
+    "/score-resumes/stream",
+    summary="Stream resume scores as they complete",
+    description="Upload multiple resumes and receive newline-delimited JSON scores as each resume is scored",
+    tags=["Resume Scoring"],
+)
+async def score_resumes_stream(
+    criteria: List[str] = Form(...),
+    files: List[UploadFile] = File(...),
+):
+    """
+    Score multiple resumes against provided criteria, streaming each result.
+
+    Parameters:
+    - criteria: List of criteria to score resumes against
+    - files: List of resume files (PDF or DOCX)
+
+    Returns:
+    - NDJSON stream with one object per candidate, in order of completion:
+      {"candidate": ..., "scores": [...], "total_score": ...}, or
+      {"candidate": ..., "error": ...} if the resume could not be processed
+    """
+    validate_score_request(criteria, files)
+
+    # Read all uploads before the response starts, since the request's files
+    # are closed once the endpoint returns
+    extracted, failed_files = await extract_texts(files)
+
+    async def _score_one(file: UploadFile, text: str) -> dict:
+        candidate_name = os.path.splitext(file.filename)[0]
+        try:
+            async with scoring_semaphore:
+                scores = await score_resume_with_llm(text, criteria)
+        except Exception as e:
+            return {"candidate": candidate_name, "error": str(e)}
+        return {"candidate": candidate_name, "scores": scores, "total_score": sum(scores)}
+
+    async def _generate():
+        for name, error in failed_files:
+            yield orjson.dumps(
+                {"candidate": os.path.splitext(name)[0], "error": str(error)}
+            ) + b"\n"
+        tasks = [asyncio.create_task(_score_one(file, text)) for file, text in extracted]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield orjson.dumps(await task) + b"\n"
+        finally:
+            # Stop scoring (and paying for) resumes nobody will read when the client disconnects
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(_generate(), media_type="application/x-ndjson")
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+    )
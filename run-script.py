@@ -12,4 +12,15 @@ if not os.environ.get("OPENAI_API_KEY"):
 # Run the FastAPI application
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
+    # Auto-reload is for development only and cannot be combined with multiple workers
+    reload = os.environ.get("RELOAD", "").lower() in ("1", "true", "yes")
+    workers = 1 if reload else int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        reload=reload,
+    )